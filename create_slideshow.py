@@ -1,21 +1,67 @@
 #!/usr/bin/env python3
 """
 Create a minimalist slideshow video from images and videos.
-Memory-efficient: processes files sequentially.
+Memory-efficient: each file is encoded into its own segment by a separate
+ffmpeg process, a few at a time.
 """
 
 import os
+import json
+import functools
+import itertools
 import subprocess
 import re
+import shutil
 import tempfile
 import platform
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 
+# Each segment encode gets a fixed thread budget so several ffmpeg processes
+# can run side by side without oversubscribing the CPU.
+THREADS_PER_JOB = 4
+
+# Consumer NVIDIA GPUs only allow a few concurrent NVENC sessions
+NVENC_MAX_JOBS = 3
+
+# Hardware encoder families for --hwaccel ('auto' tries them in order)
+HWACCELS = ['videotoolbox', 'nvenc', 'qsv', 'vaapi']
+VAAPI_DEVICE = '/dev/dri/renderD128'
+
+# libx264/libx265 presets, fastest first. Slideshow content (stills and
+# fades) gains little from the slower ones, so the default is a fast one.
+SOFTWARE_PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow', 'slower', 'veryslow']
+DEFAULT_PRESET = 'veryfast'
+
+# Shortest slide the music-length scaling will shorten slides to
+MIN_SLIDE_DURATION = 1.0
+
+# Consecutive images encoded together into one segment, so ffmpeg process,
+# filtergraph and encoder setup is paid once per batch instead of per image
+IMAGE_BATCH_SIZE = 8
+
+# Segments go to RAM-backed /dev/shm when it has at least this much room
+RAMDISK_DIR = '/dev/shm'
+RAMDISK_MIN_FREE = 1 << 30  # 1 GiB
+
+# Media file extensions (lowercase) and how each is processed
+MEDIA_TYPES = {'.png': 'image', '.mp4': 'video', '.mov': 'video'}
+
+# Sequence number in filenames like 'Griffin and Faja - 1 of 38.png'
+_NUM_RE = re.compile(r'(\d+) of \d+')
+
+
+@functools.lru_cache(maxsize=4096)
 def extract_number(filename: str) -> int:
-    """Extract the number from filename like 'Griffin and Faja - 1 of 38.png'"""
-    match = re.search(r'(\d+) of \d+', filename)
+    """
+    Extract the number from filename like 'Griffin and Faja - 1 of 38.png'
+    Cached, so rescanning the same directory doesn't match each name again.
+    """
+    if ' of ' not in filename:
+        return 0  # Can't match; skip the regex
+    match = _NUM_RE.search(filename)
     if match:
         return int(match.group(1))
     return 0
@@ -30,90 +76,93 @@ def get_media_files(directory: str, exclude_output: str = None) -> list[tuple[st
     - PNG follows with skip_fade_in=True (no fade-in)
     Excludes the output file if specified.
     """
-    directory_path = Path(directory)
-
-    # Get all media files
-    png_files = [(f, 'image') for f in directory_path.glob('*.png')]
-    mp4_files = [(f, 'video') for f in directory_path.glob('*.mp4')]
-    mov_files = [(f, 'video') for f in directory_path.glob('*.mov')]
-
-    all_files = png_files + mp4_files + mov_files
-
-    # Exclude output file if it exists
-    if exclude_output:
-        exclude_name = Path(exclude_output).name
-        all_files = [(f, t) for f, t in all_files if f.name != exclude_name]
+    # MOV before PNG before MP4 within a number
+    mov, png, mp4 = 0, 1, 2
+    kinds = {'.mov': mov, '.png': png, '.mp4': mp4}
+
+    # Get all media files in one directory pass, leaving out the output file;
+    # each is keyed for sorting right away, while its extension is at hand
+    exclude_name = os.path.basename(exclude_output) if exclude_output else None
+    keyed = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            extension = os.path.splitext(entry.name)[1].lower()
+            file_type = MEDIA_TYPES.get(extension)
+            if file_type and entry.name != exclude_name and entry.is_file():
+                keyed.append((extract_number(entry.name), kinds[extension], entry.path, file_type))
+
+    # One sort by (number, kind); the sort is stable, so ties keep directory order
+    keyed.sort(key=lambda item: item[:2])
 
-    # Group files by number
-    files_by_number = {}
-    for file_path, file_type in all_files:
-        num = extract_number(file_path.name)
-        if num not in files_by_number:
-            files_by_number[num] = []
-        files_by_number[num].append((file_path, file_type))
-
-    # Sort and process groups
     result = []
-    for num in sorted(files_by_number.keys()):
-        group = files_by_number[num]
-
-        # Separate MOV and PNG files in this group
-        movs = [(f, t) for f, t in group if f.suffix.lower() == '.mov']
-        pngs = [(f, t) for f, t in group if f.suffix.lower() == '.png']
-        others = [(f, t) for f, t in group if f.suffix.lower() not in ['.mov', '.png']]
-
+    for _, group in itertools.groupby(keyed, key=lambda item: item[0]):
+        group = list(group)
+        group_kinds = {kind for _, kind, _, _ in group}
         # If there's a MOV and PNG with same number, MOV first (no fade-out), then PNG (no fade-in)
-        if movs and pngs:
-            # Add MOV first with skip_fade_out=True
-            for f, t in movs:
-                result.append((str(f), t, False, True))
-            # Add PNG(s) with skip_fade_in=True
-            for f, t in pngs:
-                result.append((str(f), t, True, False))
+        if mov in group_kinds and png in group_kinds:
+            for _, kind, f, t in group:
+                if kind == mov:
+                    result.append((f, t, False, True))
+                elif kind == png:
+                    result.append((f, t, True, False))
         else:
             # No matching pair, add normally
-            for f, t in movs + pngs + others:
-                result.append((str(f), t, False, False))
+            result.extend((f, t, False, False) for _, _, f, t in group)
 
     return result
 
 
 def find_music_file(directory: str) -> str | None:
     """Find MP3 file in directory or media subdirectory."""
-    directory_path = Path(directory)
     # Check main directory first, then media folder
-    for search_dir in [directory_path, directory_path / 'media']:
-        mp3_files = list(search_dir.glob('*.mp3'))
-        if mp3_files:
-            return str(mp3_files[0])
+    for search_dir in [directory, os.path.join(directory, 'media')]:
+        try:
+            with os.scandir(search_dir) as entries:
+                # Stop at the first match instead of listing every mp3
+                for entry in entries:
+                    if entry.name.lower().endswith('.mp3') and entry.is_file():
+                        return entry.path
+        except OSError:
+            continue
     return None
 
 
+@functools.lru_cache(maxsize=None)
 def check_ffmpeg() -> bool:
-    """Check if ffmpeg is available."""
+    """Check if ffmpeg is available (checked once per process)."""
     try:
         subprocess.run(['ffmpeg', '-version'],
-                      capture_output=True,
+                      stdout=subprocess.DEVNULL,
+                      stderr=subprocess.DEVNULL,
                       check=True)
         return True
     except (subprocess.CalledProcessError, FileNotFoundError):
         return False
 
 
-def get_hardware_codec(codec: str) -> tuple[str, str]:
+@functools.lru_cache(maxsize=None)
+def get_hardware_codec(codec: str, hwaccel: str = 'auto') -> tuple[str, str]:
     """
     Get the best available codec for the given codec type.
     Returns (codec_name, crf) tuple.
-    Uses hardware acceleration on macOS if available, otherwise software.
+    Uses hardware acceleration if available, otherwise software:
+    VideoToolbox on macOS, NVENC, Quick Sync (QSV) or VAAPI elsewhere.
+    hwaccel picks one of HWACCELS (or 'none'); one that isn't available
+    falls back to software as well.
+    Cached, so ffmpeg -encoders and the trial encodes run once per process;
+    create_slideshow resolves it before starting the parallel encodes.
     """
-    if platform.system() != 'Darwin':  # macOS only
-        # Use software encoders for non-macOS
-        if codec == 'h265':
-            return ('libx265', '28')
-        else:
-            return ('libx264', '23')
+    crf = '28' if codec == 'h265' else '23'
+    software_codec = 'libx265' if codec == 'h265' else 'libx264'
+    prefix = 'hevc' if codec == 'h265' else 'h264'
+
+    if hwaccel == 'none':
+        return (software_codec, crf)
+    if hwaccel == 'auto':
+        candidates = ['videotoolbox'] if platform.system() == 'Darwin' else ['nvenc', 'qsv', 'vaapi']
+    else:
+        candidates = [hwaccel]
 
-    # On macOS, check for VideoToolbox hardware encoders
     try:
         # Check what encoders are available
         result = subprocess.run(
@@ -122,98 +171,460 @@ def get_hardware_codec(codec: str) -> tuple[str, str]:
             text=True,
             check=True
         )
-
-        encoders = result.stdout
-
-        if codec == 'h265':
-            if 'hevc_videotoolbox' in encoders:
-                return ('hevc_videotoolbox', '28')
-            else:
-                return ('libx265', '28')
-        else:  # h264
-            if 'h264_videotoolbox' in encoders:
-                return ('h264_videotoolbox', '23')
-            else:
-                return ('libx264', '23')
     except (subprocess.CalledProcessError, FileNotFoundError):
         # Fallback to software if we can't check
-        if codec == 'h265':
-            return ('libx265', '28')
-        else:
-            return ('libx264', '23')
+        return (software_codec, crf)
 
+    encoders = result.stdout
+    for candidate in (f'{prefix}_{family}' for family in candidates):
+        if candidate not in encoders:
+            continue
+        # VideoToolbox is always backed by hardware on macOS. NVENC/QSV/VAAPI
+        # are often compiled into ffmpeg without a matching GPU, so try them.
+        if candidate.endswith('_videotoolbox') or _encoder_works(candidate):
+            return (candidate, crf)
 
-def get_audio_duration(audio_file: str) -> float:
-    """Get duration of audio file in seconds."""
+    return (software_codec, crf)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoder_works(video_codec: str) -> bool:
+    """Check that an encoder can actually run by encoding a tiny test frame."""
     cmd = [
-        'ffprobe',
+        'ffmpeg',
+        '-hide_banner',
         '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        audio_file
+        *_hw_device_args(video_codec),
+        '-f', 'lavfi',
+        '-i', 'color=c=black:s=256x256:d=0.1',
+        '-frames:v', '1',
     ]
+    upload_filter = _upload_filter(video_codec)
+    if upload_filter:
+        cmd += ['-vf', upload_filter.lstrip(',')]
+    cmd += ['-c:v', video_codec, '-f', 'null', '-']
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        duration = float(result.stdout.strip())
-        return duration if duration > 0 else 0.0
-    except (subprocess.CalledProcessError, ValueError):
-        return 0.0
+        subprocess.run(cmd, capture_output=True, check=True, timeout=30)
+        return True
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, FileNotFoundError):
+        return False
 
 
-def get_rotation(file_path: str) -> int:
-    """Get rotation angle from video/image metadata."""
-    cmd = [
-        'ffprobe',
-        '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream_side_data_list=rotation',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        file_path
-    ]
+def _hw_device_args(video_codec: str) -> list[str]:
+    """Global ffmpeg options an encoder needs before the inputs (VAAPI device)."""
+    if video_codec.endswith('_vaapi'):
+        return ['-vaapi_device', VAAPI_DEVICE]
+    return []
+
+
+def _hw_decode_args(video_codec: str) -> list[str]:
+    """
+    Input options that decode a video on the same GPU as the encoder.
+    Decoded frames are copied back to system memory for the filters, and
+    ffmpeg falls back to software decoding if the stream isn't supported.
+    """
+    if video_codec.endswith('_videotoolbox'):
+        return ['-hwaccel', 'videotoolbox']
+    if video_codec.endswith('_vaapi'):
+        return ['-hwaccel', 'vaapi']  # Uses the -vaapi_device device
+    return []
+
+
+def _upload_filter(video_codec: str) -> str:
+    """
+    Filters appended to a chain's output for encoders that take GPU frames.
+    VAAPI encodes from hardware surfaces, so frames are uploaded as NV12.
+    """
+    if video_codec.endswith('_vaapi'):
+        return ',format=nv12,hwupload'
+    return ''
+
+
+def _rate_control_args(
+    video_codec: str,
+    crf: str,
+    still_image: bool = False,
+    preset: str = DEFAULT_PRESET
+) -> list[str]:
+    """
+    Quality settings for the chosen encoder. Hardware encoders don't take
+    -crf or the x264 presets, so map the CRF value to their own quality knob.
+    Slides and videos use the same preset: concat -c copy keeps only the
+    first segment's SPS/PPS, and presets differ in settings stored there
+    (reference frames, weighted prediction), so mixing them corrupts the
+    segments that don't match.
+    """
+    if video_codec.endswith('_nvenc'):
+        return ['-preset', 'p4', '-rc', 'vbr', '-cq', crf, '-b:v', '0']
+    if video_codec.endswith('_qsv'):
+        return ['-preset', 'medium', '-global_quality', crf]
+    if video_codec.endswith('_videotoolbox'):
+        return ['-b:v', '8M']
+    if video_codec.endswith('_vaapi'):
+        return ['-rc_mode', 'CQP', '-qp', crf]
+    # stillimage only changes per-slice and rate-control settings (deblock
+    # offsets, psy, AQ), which segments are free to differ in
+    tune = ['-tune', 'stillimage'] if still_image and video_codec == 'libx264' else []
+    return ['-preset', preset, *tune, '-crf', crf]
+
+
+# Probe results by path. Each entry records the mtime/size it was taken at,
+# so edited files are re-probed; persisted between runs in PROBE_CACHE_NAME.
+PROBE_CACHE_NAME = '.slideshow_cache.json'
+_probe_cache: dict[str, dict] = {}
+# Everything probe() reports, with the values used when it can't tell
+_PROBE_DEFAULTS = {
+    'duration': None, 'rotation': 0,
+    'width': None, 'height': None, 'sar': None,
+}
+
+
+def load_probe_cache(cache_file: str) -> None:
+    """
+    Load probe results saved by a previous run. A missing/corrupt file is
+    ignored, and so is any entry that doesn't have the shape probe() saves.
+    """
+    try:
+        with open(cache_file, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    if isinstance(data, dict):
+        _probe_cache.update(
+            (path, entry) for path, entry in data.items() if _valid_cache_entry(entry)
+        )
+
+
+def _valid_cache_entry(entry) -> bool:
+    """Check that a cache entry read from disk has probe()'s fields."""
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get('mtime_ns'), int)
+        and isinstance(entry.get('size'), int)
+        and isinstance(entry.get('info'), dict)
+        and entry['info'].keys() >= _PROBE_DEFAULTS.keys()
+    )
+
+
+def save_probe_cache(cache_file: str) -> None:
+    """Save probe results for files that still exist."""
+    entries = {path: entry for path, entry in _probe_cache.items() if os.path.exists(path)}
+    temp_file = f'{cache_file}.tmp'
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        rotation = result.stdout.strip()
-        if rotation:
-            return int(float(rotation))
-    except:
+        with open(temp_file, 'w') as f:
+            json.dump(entries, f)
+        os.replace(temp_file, cache_file)
+    except OSError:
         pass
 
-    # Check for display matrix rotation
-    cmd = [
-        'ffprobe',
-        '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'side_data=rotation',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        file_path
-    ]
+
+def probe(file_path: str) -> dict:
+    """
+    Get duration, rotation and video frame size of a media file with a
+    single ffprobe call. Returns dict with 'duration' (float or None),
+    'rotation' (int), and 'width', 'height', 'sar' of the first video
+    stream (None if unknown).
+    Results are cached per file and only re-probed when the file's mtime or
+    size changes, so repeated lookups (and reruns) don't spawn ffprobe again.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return dict(_PROBE_DEFAULTS)
+
+    entry = _probe_cache.get(file_path)
+    # load_probe_cache only keeps well-formed entries; probe() adds the rest
+    if (entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size
+            and entry['info'].keys() >= _PROBE_DEFAULTS.keys()):
+        return entry['info']
+
+    info = _probe_file(file_path, stat.st_mtime_ns, stat.st_size)
+    if info is None:
+        # Don't save failures (e.g. ffprobe missing) to disk; use the defaults
+        return dict(_PROBE_DEFAULTS)
+    _probe_cache[file_path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'info': info}
+    return info
+
+
+@functools.lru_cache(maxsize=None)
+def _probe_file(file_path: str, mtime_ns: int, size: int) -> dict | None:
+    """
+    Memoized _run_ffprobe for this process, keyed by the file's mtime/size.
+    Unlike the disk cache this also remembers failures, so a file ffprobe
+    can't read isn't retried on every lookup.
+    """
+    return _run_ffprobe(file_path)
+
+
+def _run_ffprobe(file_path: str) -> dict | None:
+    """Run ffprobe once and parse its JSON output. Returns None on failure."""
+    info = dict(_PROBE_DEFAULTS)
+    data = None
+    # Container metadata (MP4/MOV moov, MP3 headers, PNG IHDR) is enough for
+    # duration and rotation, so skip the default 5 MB / 5 s stream analysis.
+    # Retry with defaults if that isn't enough to read the file, or leaves
+    # out anything the slideshow timing and filters rely on.
+    for probe_args in (['-probesize', '32k', '-analyzeduration', '0'], []):
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            *probe_args,
+            '-select_streams', 'V:0',  # V: video that isn't an attached picture
+            '-show_format',
+            '-show_streams',
+            '-print_format', 'json',
+            file_path
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            data = json.loads(result.stdout)
+        except FileNotFoundError:
+            return None
+        except (subprocess.CalledProcessError, ValueError):
+            continue
+        if _probe_complete(data):
+            break
+    if data is None:
+        return None
+
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        rotation = result.stdout.strip()
-        if rotation:
-            return int(float(rotation))
-    except:
+        info['duration'] = float(data.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
         pass
 
+    stream = _video_stream(data)
+    if stream is not None:
+        info['rotation'] = _stream_rotation(stream)
+        info['width'] = stream.get('width')
+        info['height'] = stream.get('height')
+        info['sar'] = stream.get('sample_aspect_ratio')
+
+    return info
+
+
+def _probe_complete(data: dict) -> bool:
+    """
+    Check that parsed ffprobe output has what probe() callers rely on: a
+    duration for audio, and the frame size of the video stream.
+    """
+    stream = _video_stream(data)
+    if stream is None:
+        return data.get('format', {}).get('duration') is not None
+    return bool(stream.get('width') and stream.get('height'))
+
+
+def _video_stream(data: dict) -> dict | None:
+    """
+    The video stream of parsed ffprobe output, or None for audio. An MP3's
+    cover art shows up as a video stream too, so attached pictures are skipped.
+    """
+    for stream in data.get('streams') or []:
+        if not stream.get('disposition', {}).get('attached_pic'):
+            return stream
+    return None
+
+
+def _stream_rotation(stream: dict) -> int:
+    """
+    Find the rotation of an ffprobe stream entry: display matrix side data
+    (current ffmpeg) or the legacy 'rotate' tag (older ffmpeg builds).
+    Returns the clockwise turn needed to display it upright: 0, 90, 180 or
+    270. The display matrix angle is counterclockwise, so it is negated.
+    """
+    candidates = [(side_data.get('rotation'), -1) for side_data in stream.get('side_data_list', [])]
+    candidates.append((stream.get('tags', {}).get('rotate'), 1))
+    for rotation, sign in candidates:
+        if rotation is None:
+            continue
+        try:
+            return round(sign * float(rotation)) % 360
+        except (TypeError, ValueError):
+            continue
     return 0
 
 
+def probe_all(file_paths: list[str], max_workers: int = 8) -> None:
+    """
+    Probe many files up front, several ffprobe processes at a time.
+    ffprobe mostly waits on process startup and I/O, so this turns N
+    sequential probes into roughly N / max_workers; later probe() calls
+    are then answered from the cache.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(probe, file_paths))
+
+
+def get_audio_duration(audio_file: str) -> float:
+    """Get duration of audio file in seconds."""
+    duration = probe(audio_file)['duration']
+    return duration if duration and duration > 0 else 0.0
+
+
+def get_rotation(file_path: str) -> int:
+    """Get rotation angle from video/image metadata."""
+    return probe(file_path)['rotation']
+
+
 def get_video_duration(video_file: str) -> float:
     """Get duration of video file in seconds."""
-    cmd = [
-        'ffprobe',
-        '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        video_file
+    duration = probe(video_file)['duration']
+    # Default to 5s if we can't get a valid duration
+    return duration if duration and duration > 0 else 5.0
+
+
+def _run_quiet(cmd: list[str]) -> None:
+    """
+    Run an ffmpeg command whose output only matters if it fails.
+    stdout goes to /dev/null; stderr is kept as raw bytes and only decoded
+    for the CalledProcessError raised on a nonzero exit. The banner, the
+    progress line (rewritten every half second of the encode) and the
+    info-level stream and encoder summaries are turned off, so a successful
+    run writes nothing to the pipe and a failing one still reports its errors.
+    """
+    cmd = [cmd[0], '-hide_banner', '-nostats', '-loglevel', 'warning', *cmd[1:]]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(
+            result.returncode, cmd, stderr=result.stderr.decode(errors='replace')
+        )
+
+
+def _segment_encode_args(
+    video_codec: str,
+    crf: str,
+    fps: int,
+    threads: int,
+    still_image: bool = False,
+    preset: str = DEFAULT_PRESET
+) -> list[str]:
+    """
+    Encoder/muxer arguments shared by every segment.
+    Segments must agree on codec parameters and timebase so the concat
+    demuxer can stream-copy them straight into the final output.
+    """
+    args = [
+        '-c:v', video_codec,
+        *_rate_control_args(video_codec, crf, still_image, preset),
+        '-g', str(fps * 2),  # Keyframe every 2s for seeking in the final output
+        '-video_track_timescale', '15360',
+        '-threads', str(threads),
     ]
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        duration = float(result.stdout.strip())
-        return duration if duration > 0 else 5.0  # Default to 5s if invalid
-    except (subprocess.CalledProcessError, ValueError):
-        # If we can't get duration, default to 5 seconds
-        return 5.0
+    if still_image and video_codec == 'libx264' and threads > 1:
+        # A few seconds of slide is too short to fill x264's frame-thread
+        # pipeline; slice threads split each frame between the threads instead
+        args += ['-x264-params', 'sliced-threads=1']
+    return args
+
+
+def _fills_frame(info: dict, width: int, height: int) -> bool:
+    """
+    Check whether probed media already is exactly width x height with square
+    pixels and no rotation, so scaling and padding it would change nothing.
+    """
+    return (
+        info['width'] == width
+        and info['height'] == height
+        and info['sar'] in (None, '1:1', '0:1')  # 0:1 means unspecified
+        and info['rotation'] == 0
+    )
+
+
+def _same_aspect(info: dict, width: int, height: int) -> bool:
+    """
+    Check whether probed media, once rotated upright, has the output's
+    aspect ratio (within 1%) and square pixels, so it can be scaled straight
+    to width x height without letterboxing.
+    """
+    if not info['width'] or not info['height'] or info['sar'] not in (None, '1:1', '0:1'):
+        return False
+    source_width, source_height = info['width'], info['height']
+    if info['rotation'] in (90, 270):
+        source_width, source_height = source_height, source_width
+    return abs(source_width / source_height - width / height) < 0.01
+
+
+def _video_filter(
+    file_path: str,
+    width: int,
+    height: int,
+    fps: int,
+    duration: float,
+    fade_duration: float,
+    fade_in: bool = True,
+    fade_out: bool = True,
+    still_image: bool = False
+) -> str:
+    """
+    Build the per-file filter chain: rotate (images only), scale and center
+    with black padding, normalize SAR and frame rate, then fade in/out.
+    Media that already fills the output frame skips the scale and pad, and
+    media with the output's aspect ratio is scaled without padding.
+    For a still image (read as a single frame), the letterboxed frame is
+    built once and repeated with the loop filter, so decode, rotate and
+    scale run once per slide instead of once per output frame.
+    """
+    # Videos are already rotated by ffmpeg's autorotate (applied from the
+    # display matrix on input), so only images need an explicit rotation
+    rotation = get_rotation(file_path) if still_image else 0
+    rotation_filter = ''
+    if rotation == 90:
+        rotation_filter = 'transpose=1,'
+    elif rotation == 180:
+        rotation_filter = 'hflip,vflip,'  # Cheaper than two transposes
+    elif rotation == 270:
+        rotation_filter = 'transpose=2,'
+
+    # Build fade filter
+    fade_start = max(0, duration - fade_duration)
+    fade_parts = []
+    if fade_in:
+        fade_parts.append(f'fade=t=in:st=0:d={fade_duration}')
+    if fade_out:
+        fade_parts.append(f'fade=t=out:st={fade_start}:d={fade_duration}')
+    fade_filter = ','.join(fade_parts)
+
+    frame_rate_filter = f'fps={fps}'
+    scale_flags = ''
+    if still_image:
+        # The scale runs once per slide, so use the sharper (slower) kernel
+        scale_flags = ':flags=lanczos'
+        frame_count = max(1, round(duration * fps))
+        frame_rate_filter = (
+            f'loop=loop=-1:size=1,setpts=N/{fps}/TB,'
+            f'{frame_rate_filter},trim=end_frame={frame_count}'
+        )
+
+    info = probe(file_path)
+    if _fills_frame(info, width, height):
+        # Already the output frame: scale and pad would be identity filters
+        # run on every frame, so only the pixel format is converted. setsar
+        # is kept (it only sets metadata), since an unspecified 0:1 SAR
+        # would otherwise differ from every other segment's 1:1
+        return (
+            f'format=yuv420p,setsar=1,{frame_rate_filter}'
+            f'{"," if fade_filter else ""}{fade_filter}'
+        )
+    if _same_aspect(info, width, height):
+        # The scaled frame fills the output, so there is nothing to pad
+        return (
+            f'{rotation_filter}'
+            f'scale={width}:{height}{scale_flags},'
+            f'format=yuv420p,setsar=1,{frame_rate_filter}'
+            f'{"," if fade_filter else ""}{fade_filter}'
+        )
+
+    # Convert to the output pixel format right after scaling, so swscale
+    # resizes and converts in one pass and everything downstream (pad,
+    # loop, fades, the encoder) already gets yuv420p; converting at the end
+    # would run again on every frame, even for a looped still image
+    return (
+        f'{rotation_filter}'
+        f'scale={width}:{height}:force_original_aspect_ratio=decrease{scale_flags},'
+        f'format=yuv420p,'
+        f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,'
+        f'setsar=1,{frame_rate_filter}'
+        f'{"," if fade_filter else ""}{fade_filter}'
+    )
 
 
 def create_image_segment(
@@ -225,52 +636,83 @@ def create_image_segment(
     fade_duration: float,
     fps: int,
     skip_fade_in: bool = False,
-    codec: str = 'h264'
+    video_codec: str = 'libx264',
+    crf: str = '23',
+    threads: int = THREADS_PER_JOB,
+    preset: str = DEFAULT_PRESET
 ) -> None:
     """Create a single image slide video segment with fade and auto-rotation."""
-    fade_start = slide_duration - fade_duration
+    video_filter = _video_filter(
+        img_file, width, height, fps, slide_duration, fade_duration,
+        fade_in=not skip_fade_in, still_image=True
+    )
 
-    # Build fade filter
-    fade_parts = []
-    if not skip_fade_in:
-        fade_parts.append(f'fade=t=in:st=0:d={fade_duration}')
-    fade_parts.append(f'fade=t=out:st={fade_start}:d={fade_duration}')
-    fade_filter = ','.join(fade_parts)
+    cmd = [
+        'ffmpeg',
+        '-y',
+        '-filter_threads', str(threads),
+        *_hw_device_args(video_codec),
+        '-i', img_file,  # Single frame; _video_filter repeats it
+        '-vf', video_filter + _upload_filter(video_codec),
+        *_segment_encode_args(video_codec, crf, fps, threads, still_image=True, preset=preset),
+        output_segment
+    ]
 
-    # Get rotation and apply transpose if needed
-    rotation = get_rotation(img_file)
-    rotation_filter = ''
-    if rotation == 90:
-        rotation_filter = 'transpose=1,'
-    elif rotation == 180:
-        rotation_filter = 'transpose=1,transpose=1,'
-    elif rotation == 270:
-        rotation_filter = 'transpose=2,'
+    _run_quiet(cmd)
+
+
+def create_image_batch_segment(
+    images: list[tuple[str, bool]],
+    output_segment: str,
+    width: int,
+    height: int,
+    slide_duration: float,
+    fade_duration: float,
+    fps: int,
+    video_codec: str = 'libx264',
+    crf: str = '23',
+    threads: int = THREADS_PER_JOB,
+    preset: str = DEFAULT_PRESET
+) -> None:
+    """
+    Create one video segment from several consecutive image slides.
+    images is a list of (img_file, skip_fade_in) pairs; every image gets the
+    same per-slide filter as create_image_segment, joined with the concat
+    filter, all encoded by a single ffmpeg.
+    """
+    if len(images) == 1:
+        img_file, skip_fade_in = images[0]
+        create_image_segment(
+            img_file, output_segment, width, height, slide_duration,
+            fade_duration, fps, skip_fade_in, video_codec, crf, threads, preset
+        )
+        return
 
-    # Choose codec and settings
-    video_codec, crf = get_hardware_codec(codec)
+    inputs = []
+    filters = []
+    for i, (img_file, skip_fade_in) in enumerate(images):
+        inputs += ['-i', img_file]
+        video_filter = _video_filter(
+            img_file, width, height, fps, slide_duration, fade_duration,
+            fade_in=not skip_fade_in, still_image=True
+        )
+        filters.append(f'[{i}:v]{video_filter}[v{i}]')
+    labels = ''.join(f'[v{i}]' for i in range(len(images)))
+    filters.append(f'{labels}concat=n={len(images)}:v=1:a=0{_upload_filter(video_codec)}[outv]')
 
     cmd = [
         'ffmpeg',
         '-y',
-        '-loop', '1',
-        '-t', str(slide_duration),
-        '-i', img_file,
-        '-vf', (
-            f'{rotation_filter}'
-            f'scale={width}:{height}:force_original_aspect_ratio=decrease,'
-            f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,'
-            f'setsar=1,fps={fps},'
-            f'{fade_filter}'
-        ),
-        '-c:v', video_codec,
-        '-preset', 'medium',
-        '-crf', crf,
-        '-pix_fmt', 'yuv420p',
+        '-filter_complex_threads', str(threads),
+        *_hw_device_args(video_codec),
+        *inputs,
+        '-filter_complex', ';'.join(filters),
+        '-map', '[outv]',
+        *_segment_encode_args(video_codec, crf, fps, threads, still_image=True, preset=preset),
         output_segment
     ]
 
-    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    _run_quiet(cmd)
 
 
 def create_video_segment(
@@ -281,52 +723,259 @@ def create_video_segment(
     fade_duration: float,
     fps: int,
     skip_fade_out: bool = False,
-    codec: str = 'h264'
+    video_codec: str = 'libx264',
+    crf: str = '23',
+    threads: int = THREADS_PER_JOB,
+    preset: str = DEFAULT_PRESET
 ) -> None:
-    """Process a video file: scale, center, add fade transitions, auto-rotate."""
-    duration = get_video_duration(video_file)
-    fade_start = max(0, duration - fade_duration)
+    """
+    Process a video file: scale, center, add fade transitions, auto-rotate.
+    Always re-encoded, even when the clip already matches the output: a
+    camera's SPS/PPS (profile, level, reference frames) differ from the
+    encoder's, and concat -c copy keeps only the first segment's.
+    """
+    video_filter = _video_filter(
+        video_file, width, height, fps, get_video_duration(video_file), fade_duration,
+        fade_out=not skip_fade_out
+    )
 
-    # Build fade filter
-    fade_parts = []
-    fade_parts.append(f'fade=t=in:st=0:d={fade_duration}')
-    if not skip_fade_out:
-        fade_parts.append(f'fade=t=out:st={fade_start}:d={fade_duration}')
-    fade_filter = ','.join(fade_parts)
+    cmd = [
+        'ffmpeg',
+        '-y',
+        '-filter_threads', str(threads),
+        *_hw_device_args(video_codec),
+        *_hw_decode_args(video_codec),
+        '-i', video_file,
+        '-vf', video_filter + _upload_filter(video_codec),
+        *_segment_encode_args(video_codec, crf, fps, threads, preset=preset),
+        '-an',  # Remove audio for consistency
+        output_segment
+    ]
 
-    # Get rotation and apply transpose if needed
-    rotation = get_rotation(video_file)
-    rotation_filter = ''
-    if rotation == 90:
-        rotation_filter = 'transpose=1,'
-    elif rotation == 180:
-        rotation_filter = 'transpose=1,transpose=1,'
-    elif rotation == 270:
-        rotation_filter = 'transpose=2,'
+    _run_quiet(cmd)
+
+
+def _music_filter(
+    input_label: str,
+    video_duration: float,
+    audio_duration: float,
+    music_trim_start: float,
+    music_fade_in: float,
+    music_fade_out: float
+) -> str:
+    """
+    Build the audio filtergraph: trim the start of the music, fade in at the
+    beginning and out at the end of the video, then pad with silence or cut
+    so the track is exactly as long as the video (44.1 kHz stereo). Output
+    label is [outa].
+    """
+    # Fade out at end of slideshow
+    music_fade_out_start = video_duration - music_fade_out
+    return (
+        f'[{input_label}]atrim={music_trim_start}:{audio_duration},'
+        f'asetpts=PTS-STARTPTS,'
+        f'afade=t=in:st=0:d={music_fade_in},'
+        f'afade=t=out:st={music_fade_out_start}:d={music_fade_out},'
+        f'apad=whole_dur={video_duration},atrim=duration={video_duration},'
+        f'aformat=sample_rates=44100:channel_layouts=stereo[outa]'
+    )
 
-    # Choose codec and settings
-    video_codec, crf = get_hardware_codec(codec)
 
+def create_music_track(
+    music_file: str,
+    output_audio: str,
+    video_duration: float,
+    music_trim_start: float,
+    music_fade_in: float,
+    music_fade_out: float
+) -> None:
+    """
+    Encode the trimmed, faded music as an AAC track matching the video length.
+    It only depends on the planned video duration, so it can be encoded while
+    the video segments are, and then muxed without re-encoding.
+    """
     cmd = [
         'ffmpeg',
         '-y',
-        '-i', video_file,
-        '-vf', (
-            f'{rotation_filter}'
-            f'scale={width}:{height}:force_original_aspect_ratio=decrease,'
-            f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,'
-            f'setsar=1,fps={fps},'
-            f'{fade_filter}'
+        '-i', music_file,
+        '-filter_complex', _music_filter(
+            '0:a', video_duration, get_audio_duration(music_file),
+            music_trim_start, music_fade_in, music_fade_out
         ),
-        '-c:v', video_codec,
-        '-preset', 'medium',
-        '-crf', crf,
-        '-pix_fmt', 'yuv420p',
-        '-an',  # Remove audio for consistency
-        output_segment
+        '-map', '[outa]',
+        '-c:a', 'aac',
+        '-b:a', '192k',
+        output_audio
     ]
 
-    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    _run_quiet(cmd)
+
+
+def create_single_pass(
+    media_files: list[tuple[str, str, bool, bool]],
+    output_file: str,
+    width: int,
+    height: int,
+    slide_duration: float,
+    fade_duration: float,
+    fps: int,
+    music_file: str | None = None,
+    music_trim_start: float = 20.0,
+    music_fade_in: float = 2.0,
+    music_fade_out: float = 6.0,
+    video_codec: str = 'libx264',
+    crf: str = '23',
+    crossfade: bool = False,
+    preset: str = DEFAULT_PRESET,
+    crossfade_overlaps: list[float] | None = None
+) -> None:
+    """
+    Encode the whole slideshow with one ffmpeg invocation.
+    Every file is an input of a single filtergraph joined with the concat
+    filter, so there are no intermediate segments and only one encode.
+    All inputs are open at once, so this uses more memory than the default
+    segment pipeline.
+    With crossfade, neighbouring files are blended with xfade instead of
+    each fading through black; crossfade_overlaps is how long each pair
+    blends (0 for a direct cut, see _crossfade_overlaps), worked out from
+    the files' own lengths when not given.
+    """
+    # Slides are cut to a whole number of frames, and the fps filter turns
+    # each video into one too, so every length is counted in frames
+    durations = [
+        max(1, round((slide_duration if file_type == 'image' else get_video_duration(file_path)) * fps)) / fps
+        for file_path, file_type, _, _ in media_files
+    ]
+    if crossfade and crossfade_overlaps is None:
+        crossfade_overlaps = _crossfade_overlaps(media_files, durations, fade_duration, fps)
+
+    inputs = []
+    filters = []
+    video_duration = 0.0
+    for i, (file_path, file_type, skip_fade_in, skip_fade_out) in enumerate(media_files):
+        duration = durations[i]
+        fade_in, fade_out = not skip_fade_in, not skip_fade_out
+        if crossfade:
+            # Only the ends of the slideshow fade through black; everything
+            # else is blended into its neighbour by xfade below
+            fade_in = fade_in and i == 0
+            fade_out = fade_out and i == len(media_files) - 1
+        inputs += ['-i', file_path]
+        video_filter = _video_filter(
+            file_path, width, height, fps, duration, fade_duration,
+            fade_in=fade_in, fade_out=fade_out,
+            still_image=file_type == 'image'
+        )
+        filters.append(f'[{i}:v]{video_filter}[v{i}]')
+
+        if not crossfade:
+            video_duration += duration
+            continue
+        if i == 0:
+            video_duration = duration
+            continue
+        previous_label = '[v0]' if i == 1 else f'[x{i - 1}]'
+        # Never blend for longer than either file lasts (the planned lengths
+        # are rounded to frames here), or the offset would go backwards
+        blend = min(crossfade_overlaps[i - 1], durations[i - 1], duration)
+        if blend > 0:
+            # Start each blend on a frame boundary so rounding doesn't add
+            # up over a long slideshow and shift later transitions
+            offset = max(0, round((video_duration - blend) * fps)) / fps
+            filters.append(
+                f'{previous_label}[v{i}]xfade=transition=fade:'
+                f'duration={blend}:offset={offset:.3f}[x{i}]'
+            )
+            video_duration = offset + duration
+        else:
+            # concat switches to a microsecond timebase; xfade needs 1/fps
+            filters.append(f'{previous_label}[v{i}]concat=n=2:v=1:a=0,settb=1/{fps}[x{i}]')
+            video_duration += duration
+
+    # One encoder and one filtergraph for everything: let them use all cores
+    threads = os.cpu_count() or 1
+
+    upload_filter = _upload_filter(video_codec)
+    if not crossfade:
+        labels = ''.join(f'[v{i}]' for i in range(len(media_files)))
+        filters.append(f'{labels}concat=n={len(media_files)}:v=1:a=0{upload_filter}[outv]')
+    else:
+        # xfade may negotiate a different pixel format; end in yuv420p again
+        last_label = '[v0]' if len(media_files) == 1 else f'[x{len(media_files) - 1}]'
+        filters.append(f'{last_label}format=yuv420p{upload_filter}[outv]')
+    maps = ['-map', '[outv]']
+
+    if music_file and Path(music_file).exists():
+        inputs += ['-i', music_file]
+        filters.append(_music_filter(
+            f'{len(media_files)}:a', video_duration, get_audio_duration(music_file),
+            music_trim_start, music_fade_in, music_fade_out
+        ))
+        maps += ['-map', '[outa]', '-c:a', 'aac', '-b:a', '192k', '-shortest']
+
+    cmd = [
+        'ffmpeg',
+        '-y',
+        '-filter_complex_threads', str(threads),
+        *_hw_device_args(video_codec),
+        *inputs,
+        '-filter_complex', ';'.join(filters),
+        *maps,
+        *_segment_encode_args(video_codec, crf, fps, threads, preset=preset),
+        '-movflags', '+faststart',  # Web optimization: faster streaming start
+        output_file
+    ]
+
+    print(f"\nEncoding {len(media_files)} files in a single ffmpeg pass...")
+    subprocess.run(cmd, check=True, capture_output=False, text=True)
+
+
+def _crossfade_overlaps(
+    media_files: list[tuple[str, str, bool, bool]],
+    durations: list[float],
+    fade_duration: float,
+    fps: int
+) -> list[float]:
+    """
+    How long each pair of neighbours blends with --crossfade: entry i is
+    the overlap of media_files[i] and media_files[i + 1], 0 for a direct
+    cut. MOV -> PNG pairs are meant to cut straight from one to the other,
+    and so is any pair where a file doesn't outlast the fade by a frame:
+    xfade can't blend for longer than a file lasts, and blends start on a
+    frame boundary.
+    """
+    overlaps = []
+    for i in range(len(media_files) - 1):
+        hard_cut = media_files[i][3] or media_files[i + 1][2]
+        too_short = min(durations[i], durations[i + 1]) < fade_duration + 1 / fps
+        overlaps.append(0.0 if fade_duration <= 0 or hard_cut or too_short else fade_duration)
+    return overlaps
+
+
+def make_temp_dir(output_dir: str) -> Path:
+    """
+    Create the directory for intermediate segments.
+    Segments are written once and read back once by the concat step, so
+    they go to the /dev/shm ramdisk when it has room, and next to the
+    output otherwise.
+    """
+    parent = output_dir
+    try:
+        if shutil.disk_usage(RAMDISK_DIR).free >= RAMDISK_MIN_FREE:
+            parent = RAMDISK_DIR
+    except OSError:
+        pass
+    return Path(tempfile.mkdtemp(prefix='.slideshow_temp_', dir=parent))
+
+
+def _encode_segment(task: tuple, options: dict) -> str:
+    """
+    Run one segment encode task with the shared encoder options (video_codec,
+    crf, threads, preset). Returns the segment path.
+    """
+    encode_func, args = task
+    encode_func(*args, **options)
+    return args[1]
 
 
 def create_slideshow(
@@ -340,13 +989,25 @@ def create_slideshow(
     music_trim_start: float = 20.0,
     music_fade_in: float = 2.0,
     music_fade_out: float = 6.0,
-    codec: str = 'h264'
+    codec: str = 'h264',
+    single_pass: bool = False,
+    crossfade: bool = False,
+    jobs: int | None = None,
+    threads: int | None = None,
+    hwaccel: str = 'auto',
+    preset: str = DEFAULT_PRESET
 ) -> None:
     """
     Create a minimalist slideshow video with smooth fade transitions.
-    Memory-efficient: processes files one at a time.
+    Memory-efficient: each video, and each short run of consecutive images,
+    becomes its own segment; independent segments are encoded in parallel, then joined with the concat demuxer.
     Handles both images and videos.
     Optionally adds background music with fade in/out.
+    With single_pass, everything is encoded by one ffmpeg instead (see
+    create_single_pass); crossfade needs that path and implies it.
+    jobs is the number of concurrent segment encodes (default: CPU count
+    divided by threads, the per-encode thread budget); threads defaults to
+    an even share of the CPUs between the encodes that actually run.
     """
     if not media_files:
         print("No media files found!")
@@ -365,60 +1026,162 @@ def create_slideshow(
     width, height = int(width), int(height)
 
     script_dir = Path(output_file).parent
-    temp_dir = script_dir / '.slideshow_temp'
-    temp_dir.mkdir(exist_ok=True)
-
-    segment_files = []
-    video_without_audio = None
+    probe_cache_file = str(script_dir / PROBE_CACHE_NAME)
+    load_probe_cache(probe_cache_file)
+    probe_all([file_path for file_path, _, _, _ in media_files] + ([music_file] if music_file else []))
 
     # Calculate target duration from music if provided
     target_duration = None
     if music_file and Path(music_file).exists():
         audio_duration = get_audio_duration(music_file)
         target_duration = audio_duration - music_trim_start
+        if target_duration <= 0:
+            print(f"Error: music is {audio_duration:.2f}s long, nothing is left after trimming the first {music_trim_start}s")
+            return
         print(f"Target slideshow duration: {target_duration:.2f}s (from trimmed audio)")
 
-    # Calculate total duration needed for all slides/videos
-    total_duration_needed = 0.0
-    for file_path, file_type, _, _ in media_files:
-        if file_type == 'image':
-            total_duration_needed += slide_duration
-        else:  # video
-            vid_duration = get_video_duration(file_path)
-            total_duration_needed += vid_duration
-
-    # Adjust durations if we have a target duration
+    # Calculate total duration needed for all slides/videos; video durations
+    # are kept so the output length can be planned without probing again
+    # (probe_all above already filled the cache, so this spawns nothing)
+    video_durations = {
+        file_path: get_video_duration(file_path)
+        for file_path, file_type, _, _ in media_files if file_type == 'video'
+    }
+    image_time = image_count * slide_duration
+    fixed_time = sum(video_durations.values())
+    crossfade_overlaps = None
+    if crossfade:
+        # Each crossfade overlaps two neighbours, except across direct cuts;
+        # worked out once here so the encode blends exactly what was planned
+        crossfade_overlaps = _crossfade_overlaps(media_files, [
+            video_durations.get(file_path, slide_duration)
+            for file_path, _, _, _ in media_files
+        ], fade_duration, fps)
+        fixed_time -= sum(crossfade_overlaps)
+
+    # Adjust durations if we have a target duration. Videos keep their own
+    # length, so only the slides are stretched or shortened to make up the
+    # difference, but never below MIN_SLIDE_DURATION or, with crossfade, the
+    # fade (slides already shorter than that keep their length); the
+    # slideshow runs past the music then
     duration_scale = 1.0
-    if target_duration and total_duration_needed > 0:
-        duration_scale = target_duration / total_duration_needed
+    if target_duration and fixed_time >= target_duration:
+        print(f"Warning: the videos alone ({fixed_time:.2f}s) are longer than the music ({target_duration:.2f}s)")
+    if target_duration and image_time > 0:
+        duration_scale = max(0.0, target_duration - fixed_time) / image_time
+        # A crossfaded slide also has to outlast its blends
+        min_slide = max(MIN_SLIDE_DURATION, fade_duration) if crossfade else MIN_SLIDE_DURATION
+        min_scale = min(1.0, min_slide / slide_duration)
+        if duration_scale < min_scale:
+            duration_scale = min_scale
+            print(f"Warning: slides are kept at {slide_duration * min_scale:.2f}s, so the slideshow runs longer than the music")
         print(f"Duration scale factor: {duration_scale:.3f}")
 
-    try:
-        # Process each file sequentially
-        print("\nProcessing files...")
-        for i, (file_path, file_type, skip_fade_in, skip_fade_out) in enumerate(media_files, 1):
-            segment_file = str(temp_dir / f'segment_{i:03d}.mp4')
-            notes = []
-            if skip_fade_in:
-                notes.append("no fade-in")
-            if skip_fade_out:
-                notes.append("no fade-out")
-            note_str = f" [{', '.join(notes)}]" if notes else ""
-            print(f"  [{i}/{len(media_files)}] {Path(file_path).name} ({file_type}){note_str}")
+    # Pick the encoder once, before any encode starts: parallel segments
+    # would otherwise each run the detection (lru_cache doesn't make
+    # concurrent callers wait), and a failed trial encode in one of them
+    # would mix encoders in the concat stream copy
+    video_codec, crf = get_hardware_codec(codec, hwaccel)
+
+    if single_pass or crossfade:
+        try:
+            create_single_pass(
+                media_files, output_file, width, height,
+                slide_duration * duration_scale, fade_duration, fps,
+                music_file, music_trim_start, music_fade_in, music_fade_out,
+                video_codec, crf, crossfade, preset, crossfade_overlaps
+            )
+        finally:
+            save_probe_cache(probe_cache_file)
+        print(f"\n✓ Slideshow created: {output_file}")
+        return
 
+    temp_dir = make_temp_dir(str(script_dir))
+
+    segment_files = []
+    has_music = bool(music_file and Path(music_file).exists())
+
+    try:
+        cpu_count = os.cpu_count() or 1
+        if jobs:
+            max_workers = jobs
+        else:
+            max_workers = max(1, cpu_count // (threads or THREADS_PER_JOB))
+            if video_codec.endswith('_nvenc'):
+                max_workers = min(max_workers, NVENC_MAX_JOBS)
+        # Batches are capped so every worker still gets a share of the files
+        batch_size = max(1, min(IMAGE_BATCH_SIZE, -(-len(media_files) // max_workers)))
+
+        # Build one task per video and per run of consecutive images;
+        # segments are independent, so they can be encoded concurrently and
+        # stitched back together in order
+        tasks = []
+        task_files = []  # Indexes into media_files covered by each task
+        video_duration = 0.0
+        adjusted_slide_duration = slide_duration * duration_scale
+        for i, (file_path, file_type, skip_fade_in, skip_fade_out) in enumerate(media_files):
             if file_type == 'image':
-                adjusted_slide_duration = slide_duration * duration_scale
-                create_image_segment(
-                    file_path, segment_file, width, height,
-                    adjusted_slide_duration, fade_duration, fps, skip_fade_in, codec
-                )
+                # Slides are cut to a whole number of frames
+                video_duration += max(1, round(adjusted_slide_duration * fps)) / fps
+                previous = media_files[i - 1][1] if i else None
+                if previous == 'image' and len(task_files[-1]) < batch_size:
+                    tasks[-1][1][0].append((file_path, skip_fade_in))
+                    task_files[-1].append(i)
+                    continue
+                segment_file = str(temp_dir / f'segment_{len(tasks) + 1:03d}.mp4')
+                tasks.append((create_image_batch_segment, (
+                    [(file_path, skip_fade_in)], segment_file, width, height,
+                    adjusted_slide_duration, fade_duration, fps
+                )))
             else:  # video
-                create_video_segment(
+                segment_file = str(temp_dir / f'segment_{len(tasks) + 1:03d}.mp4')
+                tasks.append((create_video_segment, (
                     file_path, segment_file, width, height,
-                    fade_duration, fps, skip_fade_out, codec
-                )
-
+                    fade_duration, fps, skip_fade_out
+                )))
+                video_duration += video_durations[file_path]
+            task_files.append([i])
             segment_files.append(segment_file)
+        # No point starting more workers than there are segments
+        max_workers = max(1, min(max_workers, len(tasks)))
+        if threads is None:
+            # Split the CPUs between the encodes that run at the same time,
+            # so together they use every core without oversubscribing it
+            threads = max(1, cpu_count // max_workers)
+        options = {'video_codec': video_codec, 'crf': crf, 'threads': threads, 'preset': preset}
+
+        print(f"\nProcessing files ({max_workers} parallel job{'s' if max_workers != 1 else ''}, {threads} thread{'s' if threads != 1 else ''} each)...")
+        # The music gets its own worker so it is encoded while the segments are
+        with ThreadPoolExecutor(max_workers=max_workers + int(has_music)) as executor:
+            if has_music:
+                music_track = str(temp_dir / 'music.m4a')
+                music_future = executor.submit(
+                    create_music_track, music_file, music_track, video_duration,
+                    music_trim_start, music_fade_in, music_fade_out
+                )
+            futures = {executor.submit(_encode_segment, task, options): files for task, files in zip(tasks, task_files)}
+            # Report files as their segments finish; segment_files keeps concat order
+            done = 0
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception:
+                    # Don't start queued encodes once one has failed
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                for i in futures[future]:
+                    done += 1
+                    file_path, file_type, skip_fade_in, skip_fade_out = media_files[i]
+                    notes = []
+                    if skip_fade_in:
+                        notes.append("no fade-in")
+                    if skip_fade_out:
+                        notes.append("no fade-out")
+                    note_str = f" [{', '.join(notes)}]" if notes else ""
+                    print(f"  [{done}/{len(media_files)}] {Path(file_path).name} ({file_type}){note_str}")
+            if has_music:
+                music_future.result()
 
         # Create concat file list
         concat_file = str(temp_dir / 'concat_list.txt')
@@ -426,73 +1189,39 @@ def create_slideshow(
             for seg in segment_files:
                 f.write(f"file '{seg}'\n")
 
-        # Concatenate all segments (video only, no audio)
-        print("\nConcatenating segments...")
-        video_without_audio = str(temp_dir / 'video_no_audio.mp4')
-        cmd = [
-            'ffmpeg',
-            '-y',
-            '-f', 'concat',
-            '-safe', '0',
-            '-i', concat_file,
-            '-c:v', 'copy',
-            '-an',  # No audio
-            video_without_audio
-        ]
-
-        subprocess.run(cmd, check=True, capture_output=False, text=True)
-
-        # Get video duration
-        video_duration = get_video_duration(video_without_audio)
-
-        # Add music if provided
-        if music_file and Path(music_file).exists():
-            print("\nAdding background music...")
-            # Get full audio duration
-            audio_duration = get_audio_duration(music_file)
-            # Trim: remove first N seconds only, keep the rest (will fade out at end)
-            trimmed_duration = audio_duration - music_trim_start
-            # Calculate fade out timing - fade out at end of slideshow
-            music_fade_out_start = video_duration - music_fade_out
+        # The concat demuxer feeds the final mux directly, so the joined
+        # video is never written out separately
+        concat_input = ['-f', 'concat', '-safe', '0', '-i', concat_file]
+        if has_music:
+            print("\nJoining segments and adding background music...")
+            # Trim: remove first N seconds only, keep the rest (faded out at end)
+            trimmed_duration = get_audio_duration(music_file) - music_trim_start
 
             print(f"Video duration: {video_duration:.2f}s, Trimmed audio: {trimmed_duration:.2f}s")
 
-            # Choose codec and settings for final encoding
-            video_codec, crf = get_hardware_codec(codec)
-
-            # Create silent audio track for video, then mix with trimmed music
+            # Both streams are already encoded: just mux them
             cmd = [
                 'ffmpeg',
                 '-y',
-                '-i', video_without_audio,
-                '-i', music_file,
-                '-filter_complex', (
-                    f'[0:v]copy[v];'
-                    f'anullsrc=channel_layout=stereo:sample_rate=44100:duration={video_duration}[a0];'
-                    f'[1:a]atrim={music_trim_start}:{audio_duration},'
-                    f'asetpts=PTS-STARTPTS,'
-                    f'afade=t=in:st=0:d={music_fade_in},'
-                    f'afade=t=out:st={music_fade_out_start}:d={music_fade_out}[a1];'
-                    f'[a0][a1]amix=inputs=2:duration=first:dropout_transition=2[outa]'
-                ),
-                '-map', '[v]',
-                '-map', '[outa]',
-                '-c:v', video_codec,
-                '-preset', 'medium',
-                '-crf', crf,
-                '-c:a', 'aac',
-                '-b:a', '192k',
+                *concat_input,
+                '-i', music_track,
+                '-map', '0:v',
+                '-map', '1:a',
+                '-c', 'copy',
                 '-movflags', '+faststart',  # Web optimization: faster streaming start
                 '-shortest',
                 output_file
             ]
         else:
-            # No music, just copy video
+            # No music, just join the segments
+            print("\nConcatenating segments...")
             cmd = [
                 'ffmpeg',
                 '-y',
-                '-i', video_without_audio,
-                '-c', 'copy',
+                *concat_input,
+                '-c:v', 'copy',
+                '-an',  # No audio
+                '-movflags', '+faststart',  # Web optimization: faster streaming start
                 output_file
             ]
 
@@ -502,18 +1231,10 @@ def create_slideshow(
     finally:
         # Clean up temporary segments
         print("\nCleaning up temporary files...")
-        for seg in segment_files:
-            try:
-                Path(seg).unlink()
-            except:
-                pass
-        try:
-            if video_without_audio and Path(video_without_audio).exists():
-                Path(video_without_audio).unlink()
-            Path(concat_file).unlink()
-            temp_dir.rmdir()
-        except:
-            pass
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+        # After cleanup, so temp segments aren't written to the cache
+        save_probe_cache(probe_cache_file)
 
 
 def open_video(video_file: str) -> None:
@@ -540,8 +1261,19 @@ def open_video(video_file: str) -> None:
         print("Could not find default media player")
 
 
-def main():
-    """Main function."""
+def _positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1 (--jobs, --threads)."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value!r}")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line argument parser."""
     parser = argparse.ArgumentParser(
         description='Create a minimalist slideshow video from images and videos'
     )
@@ -603,10 +1335,50 @@ def main():
         type=str,
         choices=['h264', 'h265'],
         default='h264',
-        help='Video codec to use: h264 (default) or h265 (HEVC). Hardware acceleration used on macOS when available.'
+        help='Video codec to use: h264 (default) or h265 (HEVC). Encoded on the hardware --hwaccel picks when one works.'
     )
+    parser.add_argument(
+        '--hwaccel',
+        type=str,
+        choices=['auto', 'none', *HWACCELS],
+        default='auto',
+        help='Hardware encoder to use: auto (default: VideoToolbox on macOS, else NVENC, QSV or VAAPI if one works), none for software, or a specific one'
+    )
+    parser.add_argument(
+        '--preset',
+        type=str,
+        choices=SOFTWARE_PRESETS,
+        default=DEFAULT_PRESET,
+        help=f'libx264/libx265 preset for software encodes (default: {DEFAULT_PRESET}); used for image slides and videos alike'
+    )
+    parser.add_argument(
+        '--single-pass',
+        action='store_true',
+        help='Encode everything with one ffmpeg invocation instead of per-file segments (faster, uses more memory)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=_positive_int,
+        default=None,
+        help=f'Number of segments to encode at once (default: CPU count / --threads, or / {THREADS_PER_JOB} without it)'
+    )
+    parser.add_argument(
+        '--threads',
+        type=_positive_int,
+        default=None,
+        help='Threads per segment encode (default: the CPU count split evenly between the parallel jobs)'
+    )
+    parser.add_argument(
+        '--crossfade',
+        action='store_true',
+        help='Blend neighbouring slides into each other instead of fading through black (implies --single-pass)'
+    )
+    return parser
+
 
-    args = parser.parse_args()
+def main():
+    """Main function."""
+    args = build_parser().parse_args()
 
     script_dir = Path(__file__).parent
     media_dir = script_dir / 'media'
@@ -657,7 +1429,13 @@ def main():
         music_trim_start=args.music_trim_start,
         music_fade_in=args.music_fade_in,
         music_fade_out=args.music_fade_out,
-        codec=args.codec
+        codec=args.codec,
+        single_pass=args.single_pass,
+        crossfade=args.crossfade,
+        jobs=args.jobs,
+        threads=args.threads,
+        hwaccel=args.hwaccel,
+        preset=args.preset
     )
 
     # Prompt to play video
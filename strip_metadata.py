@@ -4,14 +4,79 @@ Strip metadata from media files in the media/ folder using mpv/ffmpeg.
 Removes EXIF data from images and metadata from videos.
 """
 
+import json
+import os
+import struct
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+# Batches of files stripped at once; each batch is at most one ffmpeg
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+# Files per batch; the videos in a batch are remuxed by a single ffmpeg, so
+# process startup is paid once per batch instead of once per video
+STRIP_BATCH_SIZE = 32
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+VIDEO_EXTENSIONS = {'.mov', '.mp4', '.avi', '.mkv'}
+AUDIO_EXTENSIONS = {'.mp3', '.m4a', '.aac', '.wav'}
+
+# Files already stripped, by name, with the mtime/size they had afterwards,
+# so unchanged files are skipped without being probed again
+MANIFEST_NAME = '.stripped.json'
+# Tags the mp4/mov muxer writes itself; a stripped video still has these
+MUXER_TAGS = {
+    'major_brand', 'minor_version', 'compatible_brands', 'encoder',
+    'handler_name', 'vendor_id', 'language',
+}
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG chunks needed to display the image the same way, colour profiles
+# (iCCP, cICP) included; text (tEXt, zTXt, iTXt), EXIF (eXIf), timestamps
+# and everything else are dropped
+PNG_KEEP_CHUNKS = {
+    b'IHDR', b'PLTE', b'IDAT', b'IEND',
+    b'tRNS', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'cICP', b'sBIT', b'bKGD', b'pHYs',
+}
+
+
+def _strip_png_chunks(image_path: Path, temp_path: Path) -> bool:
+    """
+    Copy a PNG to temp_path keeping only PNG_KEEP_CHUNKS. Chunks are
+    copied byte for byte (CRCs included), so the image isn't decoded or
+    re-encoded. Returns False if the file doesn't parse as a PNG.
+    """
+    with open(image_path, 'rb') as src:
+        if src.read(8) != PNG_SIGNATURE:
+            return False
+        chunks = [PNG_SIGNATURE]
+        chunk_type = None
+        while chunk_type != b'IEND':
+            header = src.read(8)
+            if len(header) != 8:
+                return False  # Truncated before IEND
+            length, chunk_type = struct.unpack('>I4s', header)
+            body = src.read(length + 4)  # Data plus CRC
+            if len(body) != length + 4:
+                return False
+            if chunk_type in PNG_KEEP_CHUNKS:
+                chunks += [header, body]
+    with open(temp_path, 'wb') as dst:
+        dst.writelines(chunks)
+    return True
+
 
 def strip_image_metadata(image_path: Path, temp_path: Path) -> bool:
-    """Strip metadata from image using ffmpeg."""
+    """
+    Strip metadata from image. PNGs have their metadata chunks dropped
+    directly; anything else (or a PNG that doesn't parse) goes through ffmpeg.
+    """
     try:
         ext = image_path.suffix.lower()
+        if ext == '.png' and _strip_png_chunks(image_path, temp_path):
+            temp_path.replace(image_path)
+            return True
         if ext == '.png':
             cmd = [
                 'ffmpeg',
@@ -45,6 +110,25 @@ def strip_image_metadata(image_path: Path, temp_path: Path) -> bool:
         return False
 
 
+# ffmpeg output options that remux a video without its metadata
+VIDEO_STRIP_ARGS = [
+    '-map_metadata', '-1',  # Remove all metadata first
+    '-metadata', 'location=',  # Explicitly clear location
+    '-metadata', 'com.apple.quicktime.location=',  # Clear QuickTime location
+    '-metadata', 'com.apple.quicktime.location.ISO6709=',  # Clear ISO location
+    '-codec', 'copy',
+]
+
+
+def _video_map_args(input_index: int) -> list[str]:
+    """
+    Streams kept when remuxing input input_index: every video and audio
+    stream. Data tracks (timecode, the metadata tracks phones can store
+    location in) and subtitles are dropped, in single and batched remuxes alike.
+    """
+    return ['-map', f'{input_index}:v', '-map', f'{input_index}:a?']
+
+
 def strip_video_metadata(video_path: Path, temp_path: Path) -> bool:
     """Strip location metadata from video using ffmpeg."""
     try:
@@ -52,11 +136,8 @@ def strip_video_metadata(video_path: Path, temp_path: Path) -> bool:
             'ffmpeg',
             '-y',
             '-i', str(video_path),
-            '-map_metadata', '-1',  # Remove all metadata first
-            '-metadata', 'location=',  # Explicitly clear location
-            '-metadata', 'com.apple.quicktime.location=',  # Clear QuickTime location
-            '-metadata', 'com.apple.quicktime.location.ISO6709=',  # Clear ISO location
-            '-codec', 'copy',
+            *_video_map_args(0),
+            *VIDEO_STRIP_ARGS,
             str(temp_path)
         ]
         subprocess.run(cmd, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -70,12 +151,126 @@ def strip_video_metadata(video_path: Path, temp_path: Path) -> bool:
         return False
 
 
+def strip_videos_metadata(video_paths: list[Path]) -> list[bool]:
+    """
+    Strip location metadata from several videos with one ffmpeg: each video
+    is an input remuxed to its own output. If the batch fails, every video
+    is retried on its own with strip_video_metadata().
+    """
+    temp_paths = [path.parent / f'.tmp_{path.name}' for path in video_paths]
+    cmd = ['ffmpeg', '-y']
+    for video_path in video_paths:
+        cmd += ['-i', str(video_path)]
+    for i, temp_path in enumerate(temp_paths):
+        # Output options apply to the output that follows them
+        cmd += [*_video_map_args(i), *VIDEO_STRIP_ARGS, str(temp_path)]
+    result = subprocess.run(cmd, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if result.returncode == 0 and all(t.exists() and t.stat().st_size > 0 for t in temp_paths):
+        for video_path, temp_path in zip(video_paths, temp_paths):
+            temp_path.replace(video_path)
+        return [True] * len(video_paths)
+    for temp_path in temp_paths:
+        if temp_path.exists():
+            temp_path.unlink()
+    return [strip_video_metadata(v, t) for v, t in zip(video_paths, temp_paths)]
+
+
 def strip_audio_metadata(audio_path: Path, temp_path: Path) -> bool:
     """Skip audio metadata stripping - keep MP3 data."""
     # Don't strip audio metadata
     return False
 
 
+def _needs_strip(video_path: Path) -> bool:
+    """
+    Check whether a video still has metadata worth removing, with one
+    ffprobe of its container and stream tags. Anything that can't be
+    probed is stripped anyway.
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries', 'format_tags:stream_tags',
+        '-of', 'json',
+        str(video_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return True
+    try:
+        data = json.loads(result.stdout)
+    except ValueError:
+        return True
+    tag_sets = [data.get('format', {}).get('tags', {})]
+    tag_sets += [stream.get('tags', {}) for stream in data.get('streams', [])]
+    return any(set(tags) - MUXER_TAGS for tags in tag_sets)
+
+
+def strip_file(file_path: Path) -> str:
+    """
+    Strip metadata from one image or video, replacing it in place.
+    Returns 'stripped', 'clean' (nothing to remove) or 'failed'.
+    """
+    # ffprobe can't see PNG text chunks, so images are always rewritten
+    if file_path.suffix.lower() in VIDEO_EXTENSIONS and not _needs_strip(file_path):
+        return 'clean'
+    # Use same extension for temp file - prepend dot to filename
+    temp_path = file_path.parent / f'.tmp_{file_path.name}'
+    if file_path.suffix.lower() in IMAGE_EXTENSIONS:
+        success = strip_image_metadata(file_path, temp_path)
+    else:
+        success = strip_video_metadata(file_path, temp_path)
+    if not success and temp_path.exists():
+        temp_path.unlink()
+    return 'stripped' if success else 'failed'
+
+
+def strip_files(file_paths: list[Path]) -> list[str]:
+    """
+    Strip metadata from a batch of images and videos, replacing them in
+    place. Images are handled one by one; the videos that still have
+    metadata share one ffmpeg. Returns a strip_file() status per file.
+    """
+    statuses = {}
+    videos = []
+    for file_path in file_paths:
+        if file_path.suffix.lower() not in VIDEO_EXTENSIONS:
+            statuses[file_path] = strip_file(file_path)
+        elif _needs_strip(file_path):
+            videos.append(file_path)
+        else:
+            statuses[file_path] = 'clean'
+    if videos:
+        for video_path, success in zip(videos, strip_videos_metadata(videos)):
+            statuses[video_path] = 'stripped' if success else 'failed'
+    return [statuses[file_path] for file_path in file_paths]
+
+
+def load_manifest(manifest_file: Path) -> dict:
+    """Read the stripped-files manifest; a missing or broken one is empty."""
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_manifest(manifest_file: Path, manifest: dict) -> None:
+    """Write the stripped-files manifest (best effort)."""
+    try:
+        with open(manifest_file, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+    except OSError:
+        pass
+
+
+def _file_key(file_path: Path) -> list[int]:
+    """mtime/size pair identifying a file's current contents."""
+    st = file_path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
 def main():
     media_dir = Path('media')
 
@@ -83,13 +278,13 @@ def main():
         print("Error: media/ directory not found")
         return
 
-    image_extensions = {'.png', '.jpg', '.jpeg'}
-    video_extensions = {'.mov', '.mp4', '.avi', '.mkv'}
-    audio_extensions = {'.mp3', '.m4a', '.aac', '.wav'}
-
+    # One directory pass instead of a glob per extension
+    wanted = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS | AUDIO_EXTENSIONS
     files_to_process = []
-    for ext in image_extensions | video_extensions | audio_extensions:
-        files_to_process.extend(media_dir.glob(f'*{ext}'))
+    with os.scandir(media_dir) as entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1].lower() in wanted and entry.is_file():
+                files_to_process.append(Path(entry.path))
 
     if not files_to_process:
         print("No media files found in media/ directory")
@@ -101,30 +296,39 @@ def main():
     success_count = 0
     fail_count = 0
 
+    manifest_file = media_dir / MANIFEST_NAME
+    manifest = load_manifest(manifest_file)
+
+    to_strip = []
     for file_path in sorted(files_to_process):
-        print(f"Processing: {file_path.name}...", end=' ')
-        # Use same extension for temp file - prepend dot to filename
-        temp_path = file_path.parent / f'.tmp_{file_path.name}'
-
-        success = False
-        if file_path.suffix.lower() in image_extensions:
-            success = strip_image_metadata(file_path, temp_path)
-        elif file_path.suffix.lower() in video_extensions:
-            success = strip_video_metadata(file_path, temp_path)
-        elif file_path.suffix.lower() in audio_extensions:
+        if file_path.suffix.lower() in AUDIO_EXTENSIONS:
             # Skip audio files - keep their metadata
-            print("(skipped - keeping metadata)")
-            success = True  # Count as success since we're intentionally skipping
-            continue
-
-        if success:
-            print("✓")
+            print(f"Processing: {file_path.name}... (skipped - keeping metadata)")
+        elif manifest.get(file_path.name) == _file_key(file_path):
+            print(f"Processing: {file_path.name}... ✓ (already stripped)")
             success_count += 1
         else:
-            print("✗")
-            fail_count += 1
-            if temp_path.exists():
-                temp_path.unlink()
+            to_strip.append(file_path)
+
+    # Batches are independent, so several run side by side (capped so every
+    # worker still gets a share of the files); results are counted and
+    # printed here, in the main thread
+    batch_size = max(1, min(STRIP_BATCH_SIZE, -(-len(to_strip) // MAX_WORKERS)))
+    batches = [to_strip[i:i + batch_size] for i in range(0, len(to_strip), batch_size)]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {executor.submit(strip_files, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            for file_path, status in zip(futures[future], future.result()):
+                if status == 'failed':
+                    print(f"Processing: {file_path.name}... ✗")
+                    fail_count += 1
+                    continue
+                note = " (no metadata)" if status == 'clean' else ""
+                print(f"Processing: {file_path.name}... ✓{note}")
+                success_count += 1
+                manifest[file_path.name] = _file_key(file_path)
+
+    save_manifest(manifest_file, manifest)
 
     print(f"\nDone! Success: {success_count}, Failed: {fail_count}")
 
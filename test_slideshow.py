@@ -2,16 +2,36 @@
 """
 Automated tests for create_slideshow.py
 Run with: python3 -m pytest test_slideshow.py -v
-Or: python3 test_slideshow.py
+Or: python3 test_slideshow.py (uses pytest, and pytest-xdist, when installed)
 """
 
+import io
+import json
+import os
 import sys
+import struct
 import subprocess
 import platform
+import re
+import tempfile
+import time
+import zlib
+from contextlib import redirect_stderr
 from pathlib import Path
 
+try:
+    import pytest
+    parametrize = pytest.mark.parametrize
+except ImportError:
+    pytest = None
+
+    # Without pytest, run_tests() passes each case to the test itself
+    def parametrize(argnames, argvalues):
+        return lambda test_func: test_func
+
 # Import the module to test
 try:
+    import create_slideshow
     from create_slideshow import (
         check_ffmpeg,
         get_media_files,
@@ -21,21 +41,34 @@ try:
         get_audio_duration,
         get_video_duration,
         get_rotation,
+        build_parser,
+        MEDIA_TYPES,
+        SOFTWARE_PRESETS,
     )
+    import strip_metadata
 except ImportError as e:
     print(f"Error importing create_slideshow: {e}")
     sys.exit(1)
 
+# check_ffmpeg() and get_hardware_codec() cache their results, so the
+# ffmpeg probes behind them run once however many tests ask
+IS_MACOS = platform.system() == 'Darwin'
+
+EXTRACT_NUMBER_CASES = [
+    ("Griffin and Faja - 1 of 38.png", 1),
+    ("Griffin and Faja - 10 of 38.mov", 10),
+    ("test.png", 0),  # No number
+    ("file - 5 of 20.png", 5),
+    ("one of them.png", 0),  # ' of ' without a number
+]
+CODECS = ['h264', 'h265']
+COUNT_REJECTIONS = [(option, value) for option in ('--jobs', '--threads') for value in ('0', '-1', 'two')]
+MEDIA_FILE_TYPES = frozenset(MEDIA_TYPES.values())
+
 
 class TestSlideshow:
     """Test suite for slideshow generator."""
 
-    def test_python_syntax(self):
-        """Test that the Python file has valid syntax."""
-        with open('create_slideshow.py', 'r') as f:
-            compile(f.read(), 'create_slideshow.py', 'exec')
-        assert True
-
     def test_imports(self):
         """Test that all required functions can be imported."""
         assert check_ffmpeg is not None
@@ -47,6 +80,16 @@ class TestSlideshow:
         """Test that ffmpeg is available."""
         assert check_ffmpeg() is True, "ffmpeg is not installed or not in PATH"
 
+    def test_probes_cached(self):
+        """Test that repeated ffmpeg/encoder checks don't spawn ffmpeg again."""
+        check_ffmpeg()
+        get_hardware_codec('h264')
+        hits = check_ffmpeg.cache_info().hits, get_hardware_codec.cache_info().hits
+        assert check_ffmpeg() == check_ffmpeg()
+        assert get_hardware_codec('h264') == get_hardware_codec('h264')
+        assert check_ffmpeg.cache_info().hits >= hits[0] + 2
+        assert get_hardware_codec.cache_info().hits >= hits[1] + 2
+
     def test_hardware_codec_detection(self):
         """Test hardware codec detection."""
         h264_codec, h264_crf = get_hardware_codec('h264')
@@ -57,12 +100,126 @@ class TestSlideshow:
         assert h264_crf in ['23', '28']
         assert h265_crf in ['23', '28']
 
+        # Software only when hardware acceleration is turned off
+        assert get_hardware_codec('h264', 'none') == ('libx264', '23')
+        assert get_hardware_codec('h265', 'none') == ('libx265', '28')
+
         # On macOS, should use VideoToolbox if available
-        if platform.system() == 'Darwin':
+        if IS_MACOS:
             # Either hardware or software encoder is fine
             assert 'h264' in h264_codec.lower() or 'libx264' in h264_codec.lower()
             assert 'h265' in h265_codec.lower() or 'hevc' in h265_codec.lower() or 'libx265' in h265_codec.lower()
 
+    def test_durations_cached(self):
+        """Test that a file is probed once, however often its duration is asked for."""
+        calls = []
+
+        def fake_run(cmd, **kwargs):
+            calls.append(cmd)
+            output = json.dumps({'format': {'duration': '12.5'}, 'streams': []})
+            return subprocess.CompletedProcess(cmd, 0, stdout=output, stderr='')
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            music_file = str(Path(temp_dir) / 'song.mp3')
+            Path(music_file).write_bytes(b'not really an mp3')
+            original_run = create_slideshow.subprocess.run
+            create_slideshow.subprocess.run = fake_run
+            try:
+                assert get_audio_duration(music_file) == 12.5
+                assert get_audio_duration(music_file) == 12.5
+                assert get_video_duration(music_file) == 12.5
+            finally:
+                create_slideshow.subprocess.run = original_run
+        assert len(calls) == 1, f"ffprobe ran {len(calls)} times"
+
+    def test_crossfade_skips_short_clips(self):
+        """Test that a clip shorter than the fade is cut to, not blended into its neighbours."""
+        media_files = [
+            ('23.png', 'image', False, False),
+            ('24.mov', 'video', False, False),  # Shorter than the fade
+            ('25.mov', 'video', False, False),
+            ('26.png', 'image', False, False),
+            ('26.mov', 'video', False, True),   # MOV -> PNG pair: no fade-out
+            ('27.png', 'image', True, False),
+            ('28.png', 'image', False, False),
+        ]
+        durations = [4.0, 0.04, 3.0, 4.0, 3.0, 4.0, 4.0]
+        overlaps = create_slideshow._crossfade_overlaps(media_files, durations, 0.5, 30)
+        assert overlaps == [0.0, 0.0, 0.5, 0.5, 0.0, 0.5]
+
+    @parametrize('preset', SOFTWARE_PRESETS)
+    def test_segments_share_preset(self, preset):
+        """Test that slides and videos get the same encoder settings, so concat can copy them."""
+        # One thread, so the slide doesn't add sliced-threads
+        slide = create_slideshow._segment_encode_args('libx264', '23', 30, 1, still_image=True, preset=preset)
+        video = create_slideshow._segment_encode_args('libx264', '23', 30, 1, preset=preset)
+        # -tune stillimage only changes per-slice and rate-control settings
+        tune = slide.index('-tune')
+        assert slide[:tune] + slide[tune + 2:] == video
+
+    def test_probe_cache_skips_bad_entries(self):
+        """Test that malformed entries in the saved probe cache are ignored."""
+        entries = {
+            'good.mp4': {'mtime_ns': 1, 'size': 2, 'info': dict(create_slideshow._PROBE_DEFAULTS, duration=3.0)},
+            'no_info.mp4': {'mtime_ns': 1, 'size': 2},
+            'not_a_dict.mp4': 'truncated',
+            'missing_fields.mp4': {'mtime_ns': 1, 'size': 2, 'info': {'duration': 3.0}},
+        }
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_file = str(Path(temp_dir) / create_slideshow.PROBE_CACHE_NAME)
+            Path(cache_file).write_text(json.dumps(entries))
+            try:
+                create_slideshow.load_probe_cache(cache_file)
+                assert 'good.mp4' in create_slideshow._probe_cache
+                for path in ('no_info.mp4', 'not_a_dict.mp4', 'missing_fields.mp4'):
+                    assert path not in create_slideshow._probe_cache
+            finally:
+                for path in entries:
+                    create_slideshow._probe_cache.pop(path, None)
+
+    def test_reduced_probe_falls_back(self):
+        """Test that a file is probed again with defaults when the quick probe misses its duration."""
+        calls = []
+
+        def fake_run(cmd, **kwargs):
+            calls.append(cmd)
+            # The quick probe (-probesize 32k) finds no duration
+            duration = {} if '-probesize' in cmd else {'duration': '30.0'}
+            output = json.dumps({'format': duration, 'streams': []})
+            return subprocess.CompletedProcess(cmd, 0, stdout=output, stderr='')
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            music_file = str(Path(temp_dir) / 'song.mp3')
+            Path(music_file).write_bytes(b'not really an mp3')
+            original_run = create_slideshow.subprocess.run
+            create_slideshow.subprocess.run = fake_run
+            try:
+                assert get_audio_duration(music_file) == 30.0
+            finally:
+                create_slideshow.subprocess.run = original_run
+        assert len(calls) == 2 and '-probesize' not in calls[1]
+
+    def test_cover_art_probed_once(self):
+        """Test that an MP3's cover art doesn't make the quick probe look incomplete."""
+        calls = []
+
+        def fake_run(cmd, **kwargs):
+            calls.append(cmd)
+            cover_art = {'codec_type': 'video', 'codec_name': 'png', 'disposition': {'attached_pic': 1}}
+            output = json.dumps({'format': {'duration': '267.15'}, 'streams': [cover_art]})
+            return subprocess.CompletedProcess(cmd, 0, stdout=output, stderr='')
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            music_file = str(Path(temp_dir) / 'song.mp3')
+            Path(music_file).write_bytes(b'not really an mp3')
+            original_run = create_slideshow.subprocess.run
+            create_slideshow.subprocess.run = fake_run
+            try:
+                assert get_audio_duration(music_file) == 267.15
+            finally:
+                create_slideshow.subprocess.run = original_run
+        assert len(calls) == 1, f"ffprobe ran {len(calls)} times"
+
     def test_media_files_detection(self):
         """Test media files detection."""
         media_dir = Path('media')
@@ -76,7 +233,7 @@ class TestSlideshow:
         # Check structure of returned tuples
         for file_path, file_type, skip_fade_in, skip_fade_out in media_files[:5]:
             assert isinstance(file_path, str)
-            assert file_type in ['image', 'video']
+            assert file_type in MEDIA_FILE_TYPES
             assert isinstance(skip_fade_in, bool)
             assert isinstance(skip_fade_out, bool)
 
@@ -86,46 +243,122 @@ class TestSlideshow:
         # Music file is optional, so just check it returns None or a valid path
         if music_file:
             assert Path(music_file).exists(), f"Music file not found: {music_file}"
-            assert music_file.endswith('.mp3'), "Music file should be MP3"
+            assert music_file.lower().endswith('.mp3'), "Music file should be MP3"
 
-    def test_extract_number(self):
+    @parametrize('filename,expected', EXTRACT_NUMBER_CASES)
+    def test_extract_number(self, filename, expected):
         """Test number extraction from filenames."""
-        assert extract_number("Griffin and Faja - 1 of 38.png") == 1
-        assert extract_number("Griffin and Faja - 10 of 38.mov") == 10
-        assert extract_number("test.png") == 0  # No number
-        assert extract_number("file - 5 of 20.png") == 5
+        assert extract_number(filename) == expected
+
+    def test_extract_number_cached(self):
+        """Test that repeated lookups of a filename come from the cache."""
+        extract_number("Griffin and Faja - 7 of 38.png")
+        hits = extract_number.cache_info().hits
+        assert extract_number("Griffin and Faja - 7 of 38.png") == 7
+        assert extract_number.cache_info().hits == hits + 1
+
+    def test_extract_number_many_files(self):
+        """Test that number extraction for large directories runs each name through the regex once."""
+        # The pattern is compiled once at import, not per call
+        assert isinstance(create_slideshow._NUM_RE, re.Pattern)
+        # Fewer names than the cache holds, so none are evicted before the rerun
+        names = [f"Slide - {i} of 1000.png" for i in range(1000)]
+        misses = extract_number.cache_info().misses
+        assert [extract_number(name) for name in names] == list(range(1000))
+        # Names are distinct, so each was parsed once; asking again is all cache hits
+        assert extract_number.cache_info().misses == misses + 1000
+        assert [extract_number(name) for name in names] == list(range(1000))
+        assert extract_number.cache_info().misses == misses + 1000
+
+    def test_png_strip_keeps_colour_chunks(self):
+        """Test that stripping a PNG drops its text but keeps its colour profile."""
+        def chunk(chunk_type, data):
+            crc = zlib.crc32(chunk_type + data)
+            return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+        # A 1x1 grey image with an ICC profile and a text comment
+        png = strip_metadata.PNG_SIGNATURE + b''.join([
+            chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)),
+            chunk(b'iCCP', b'Display P3\0\0' + zlib.compress(b'not a real profile')),
+            chunk(b'tEXt', b'Comment\0taken on my phone'),
+            chunk(b'IDAT', zlib.compress(b'\0\x80')),
+            chunk(b'IEND', b''),
+        ])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image_path = Path(temp_dir) / 'slide.png'
+            stripped_path = Path(temp_dir) / 'stripped.png'
+            image_path.write_bytes(png)
+            assert strip_metadata._strip_png_chunks(image_path, stripped_path)
+            data = stripped_path.read_bytes()
+
+        chunk_types = []
+        offset = len(strip_metadata.PNG_SIGNATURE)
+        while offset < len(data):
+            length, chunk_type = struct.unpack('>I4s', data[offset:offset + 8])
+            chunk_types.append(chunk_type)
+            offset += length + 12
+        assert chunk_types == [b'IHDR', b'iCCP', b'IDAT', b'IEND']
 
     def test_command_line_help(self):
         """Test that command-line help works."""
+        help_text = build_parser().format_help()
+        assert '--codec' in help_text
+        assert 'h264' in help_text
+        assert 'h265' in help_text
+        assert '--single-pass' in help_text
+        assert '--crossfade' in help_text
+        assert '--preset' in help_text
+
+    def test_script_runs(self):
+        """Test that the script itself starts and exits cleanly with --help."""
+        # The help text is checked in-process; only the exit status matters
         result = subprocess.run(
-            ['python3', 'create_slideshow.py', '--help'],
-            capture_output=True,
-            text=True,
-            check=True
+            [sys.executable, 'create_slideshow.py', '--help'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
         )
-        assert '--codec' in result.stdout
-        assert 'h264' in result.stdout
-        assert 'h265' in result.stdout
+        assert result.returncode == 0
 
     def test_codec_validation(self):
         """Test that invalid codecs are rejected."""
-        result = subprocess.run(
-            ['python3', 'create_slideshow.py', '--codec', 'invalid'],
-            capture_output=True,
-            text=True
-        )
-        assert result.returncode != 0, "Invalid codec should be rejected"
+        try:
+            with redirect_stderr(io.StringIO()):
+                build_parser().parse_args(['--codec', 'invalid'])
+        except SystemExit as e:
+            assert e.code != 0, "Invalid codec should be rejected"
+        else:
+            assert False, "Invalid codec should be rejected"
+
+    @parametrize('option,value', COUNT_REJECTIONS)
+    def test_count_validation(self, option, value):
+        """Test that --jobs and --threads reject zero, negative and non-integer values."""
+        try:
+            with redirect_stderr(io.StringIO()):
+                build_parser().parse_args([option, value])
+        except SystemExit as e:
+            assert e.code != 0, f"{option} {value} should be rejected"
+        else:
+            assert False, f"{option} {value} should be rejected"
 
-    def test_valid_codecs(self):
+    @parametrize('codec', CODECS)
+    def test_valid_codecs(self, codec):
         """Test that valid codecs are accepted."""
-        for codec in ['h264', 'h265']:
-            result = subprocess.run(
-                ['python3', 'create_slideshow.py', '--codec', codec, '--help'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            assert result.returncode == 0
+        args = build_parser().parse_args(['--codec', codec])
+        assert args.codec == codec
+
+
+def run_with_pytest() -> bool:
+    """
+    Run the tests with pytest, spread over a few worker processes when
+    pytest-xdist is installed (most tests just wait on subprocesses).
+    """
+    args = ['-v', __file__]
+    try:
+        import xdist  # noqa: F401
+        args += ['-n', str(max(1, (os.cpu_count() or 1) // 2))]
+    except ImportError:
+        pass
+    return pytest.main(args) == 0
 
 
 def run_tests():
@@ -136,43 +369,59 @@ def run_tests():
 
     test_instance = TestSlideshow()
     tests = [
-        ("Python syntax", test_instance.test_python_syntax),
         ("Imports", test_instance.test_imports),
         ("ffmpeg availability", test_instance.test_ffmpeg_available),
+        ("Cached ffmpeg probes", test_instance.test_probes_cached),
         ("Hardware codec detection", test_instance.test_hardware_codec_detection),
+        ("Cached durations", test_instance.test_durations_cached),
+        ("Probe cache validation", test_instance.test_probe_cache_skips_bad_entries),
+        ("Reduced probe fallback", test_instance.test_reduced_probe_falls_back),
+        ("Cover art probe", test_instance.test_cover_art_probed_once),
+        ("Crossfade around short clips", test_instance.test_crossfade_skips_short_clips),
+        ("Shared segment preset", test_instance.test_segments_share_preset, [(preset,) for preset in SOFTWARE_PRESETS]),
         ("Media files detection", test_instance.test_media_files_detection),
         ("Music file detection", test_instance.test_music_file_detection),
-        ("Number extraction", test_instance.test_extract_number),
+        ("Number extraction", test_instance.test_extract_number, EXTRACT_NUMBER_CASES),
+        ("Cached number extraction", test_instance.test_extract_number_cached),
+        ("Number extraction for many files", test_instance.test_extract_number_many_files),
+        ("PNG metadata stripping", test_instance.test_png_strip_keeps_colour_chunks),
         ("Command-line help", test_instance.test_command_line_help),
+        ("Script startup", test_instance.test_script_runs),
         ("Codec validation", test_instance.test_codec_validation),
-        ("Valid codecs", test_instance.test_valid_codecs),
+        ("Job/thread count validation", test_instance.test_count_validation, COUNT_REJECTIONS),
+        ("Valid codecs", test_instance.test_valid_codecs, [(codec,) for codec in CODECS]),
     ]
 
     passed = 0
     failed = 0
+    durations = []
 
-    for name, test_func in tests:
+    for name, test_func, *cases in tests:
+        print(f"\n[{passed + failed + 1}/{len(tests)}] Testing {name}...")
+        start = time.perf_counter()
         try:
-            print(f"\n[{passed + failed + 1}/{len(tests)}] Testing {name}...")
-            test_func()
+            # Parametrized tests come with their cases; run each of them
+            for args in (cases[0] if cases else [()]):
+                test_func(*args)
             print(f"  ✓ {name}")
             passed += 1
-        except AssertionError as e:
-            print(f"  ✗ {name}: {e}")
-            failed += 1
-        except Exception as e:
+        except Exception as e:  # Failed assertions and errors alike
             print(f"  ✗ {name}: {e}")
             failed += 1
+        durations.append((time.perf_counter() - start, name))
 
     print("\n" + "=" * 60)
     print(f"Results: {passed} passed, {failed} failed")
+    print("Slowest tests:")
+    for duration, name in sorted(durations, reverse=True)[:3]:
+        print(f"  {duration:.3f}s {name}")
     print("=" * 60)
 
     return failed == 0
 
 
 if __name__ == '__main__':
-    success = run_tests()
+    success = run_with_pytest() if pytest else run_tests()
     sys.exit(0 if success else 1)
 
 